@@ -31,6 +31,9 @@ from __future__ import (
 )
 __metaclass__ = type  # pylint: disable=invalid-name
 
+import sys
+from operator import methodcaller
+
 # Note: doctests require Python 3 (python3 -m doctest macfmt.py)
 
 PROG = 'macfmt.py'
@@ -45,6 +48,8 @@ line arguments.
 """
 
 HEX_DIGITS = {d for d in '0123456789abcdefABCDEF'}
+NON_HEX_BYTES = bytes(bytearray(c for c in range(256)
+                                if chr(c) not in HEX_DIGITS))
 MAC_LEN = 12
 
 # MAC format is a tupel or an alias
@@ -80,30 +85,42 @@ MAC_FORMAT = {
     'vmps': ('', 4, '.', 'upper', ''),
 }
 
+# resolve aliases once, so that every MAC_FORMAT value is a format tupel
+for _name, _fmt in MAC_FORMAT.items():
+    while not isinstance(_fmt, tuple):
+        _fmt = MAC_FORMAT[_fmt]
+    MAC_FORMAT[_name] = _fmt
+del _name, _fmt
+
 
 def keep_hex(in_str):
-    """Return list of hexadecimal digits (nybbles) from in_str.
+    """Return string of hexadecimal digits (nybbles) from in_str.
 
     Examples:
     >>> keep_hex('01:23:45:67:89:ab')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'a', 'b']
+    '0123456789ab'
     >>> keep_hex(' 01-23-45-67-89-AB ')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'A', 'B']
+    '0123456789AB'
     >>> keep_hex('112233445566')
-    ['1', '1', '2', '2', '3', '3', '4', '4', '5', '5', '6', '6']
+    '112233445566'
     >>> keep_hex('')
-    []
+    ''
     >>> keep_hex('01 23-45:67.89')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9']
+    '0123456789'
     >>> keep_hex('abcdef-ABCDEF')
-    ['a', 'b', 'c', 'd', 'e', 'f', 'A', 'B', 'C', 'D', 'E', 'F']
-    >>> keep_hex(' [00:00:00_00:00:00] ') == ['0'] * 12
+    'abcdefABCDEF'
+    >>> keep_hex(' [00:00:00_00:00:00] ') == '0' * 12
     True
     >>> keep_hex('.,<>;:-[]() gG%$/')
-    []
+    ''
+    >>> keep_hex(b'\\xff01:23:45:67:89:ab\\xc3\\xa9')
+    '0123456789ab'
 
     """
-    return [c for c in in_str if c in HEX_DIGITS]
+    if not isinstance(in_str, bytes):
+        # text string: drop non-ASCII characters, none of them is a nybble
+        in_str = in_str.encode('ascii', 'ignore')
+    return in_str.translate(None, NON_HEX_BYTES).decode('ascii')
 
 
 def find_separator(in_str):
@@ -120,30 +137,34 @@ def find_separator(in_str):
     True
     >>> find_separator(' 1 2-3 ') is None
     True
+    >>> find_separator('1122334455') is None
+    True
+    >>> find_separator('11--22')
+    '-'
 
     """
-    candidates = {c for c in in_str.strip() if c not in HEX_DIGITS}
+    candidates = set(in_str.strip()) - HEX_DIGITS
     if len(candidates) == 1:
         return candidates.pop()
     return None
 
 
 def keep_zero_padded_hex(in_str):
-    """Return zero-padded list of nybbles if s is a MAC address, or None.
+    """Return zero-padded string of nybbles if s is a MAC address, or None.
 
     Examples:
     >>> keep_zero_padded_hex('01:23:45:67:89:ab')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'a', 'b']
+    '0123456789ab'
     >>> keep_zero_padded_hex('   01:23:45:67:89:ab   ')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'a', 'b']
+    '0123456789ab'
     >>> keep_zero_padded_hex('123.4567.89Ab')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'A', 'b']
+    '0123456789Ab'
     >>> keep_zero_padded_hex('   12345-6789ab   ')
-    ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'a', 'b']
+    '0123456789ab'
     >>> keep_zero_padded_hex(' 2:4:96:90:0:e ')
-    ['0', '2', '0', '4', '9', '6', '9', '0', '0', '0', '0', 'e']
+    '02049690000e'
     >>> keep_zero_padded_hex(' 204:9690:e ')
-    ['0', '2', '0', '4', '9', '6', '9', '0', '0', '0', '0', 'e']
+    '02049690000e'
     >>> keep_zero_padded_hex('') is None
     True
     >>> keep_zero_padded_hex('11') is None
@@ -161,32 +182,45 @@ def keep_zero_padded_hex(in_str):
         return None
     groups = in_str.strip().split(sep)
     group_size = MAC_LEN // len(groups)
-    nybbles = []
-    for grp in groups:
-        nybbles.extend(['0'] * (group_size - len(grp)))
-        nybbles.extend(grp)
-    return nybbles
+    return ''.join(['0' * (group_size - len(grp)) + grp for grp in groups])
 
 
 def is_mac(nybbles):
     """Return True if nybbles represents a MAC address.
 
+    The nybbles are expected to be hexadecimal digits only, as returned by
+    keep_hex() and keep_zero_padded_hex(). Use is_valid_mac_string() to
+    check arbitrary strings.
+
     Examples:
     >>> is_mac('112233445566')
-    False
-    >>> is_mac(['1', '1', '2', '2', '3', '3', '4', '4', '5', '5', '6', '6'])
     True
-    >>> is_mac(['1', '1', '2', '2', '3', '3', '4', '4', '5', '5', '6'])
+    >>> is_mac('11223344556')
     False
-    >>> is_mac(['1','1','2','2','3','3','4','4','5','5','6','6','7'])
+    >>> is_mac('1122334455667')
     False
     >>> is_mac('')
     False
-    >>> is_mac([])
+
+    """
+    return len(nybbles) == MAC_LEN
+
+
+def is_valid_mac_string(in_str):
+    """Return True if in_str comprises just the 12 nybbles of a MAC address.
+
+    Examples:
+    >>> is_valid_mac_string('112233445566')
+    True
+    >>> is_valid_mac_string('11223344556g')
+    False
+    >>> is_valid_mac_string('11:22:33:44:55:66')
+    False
+    >>> is_valid_mac_string('')
     False
 
     """
-    return len(nybbles) == MAC_LEN and nybbles == keep_hex(nybbles)
+    return len(in_str) == MAC_LEN and HEX_DIGITS.issuperset(in_str)
 
 
 def lookup_format(name):
@@ -208,10 +242,64 @@ def lookup_format(name):
     ...         print('FAIL')
 
     """
-    fmt = MAC_FORMAT[name]
-    if isinstance(fmt, tuple):
-        return fmt
-    return lookup_format(fmt)
+    return MAC_FORMAT[name]
+
+
+def make_formatter(fmt):
+    """Return function that formats a string of nybbles according to fmt.
+
+    The format tupel is evaluated once, the returned function only slices,
+    case-converts, and joins the nybbles.
+
+    Examples:
+    >>> make_formatter(('', 4, '.', 'lower', ''))('0123456789AB')
+    '0123.4567.89ab'
+    >>> make_formatter(('0x', 12, '', 'upper', 'h'))('0123456789ab')
+    '0x0123456789ABh'
+
+    """
+    pref, grp_sz, sep, case, suf = fmt
+    groups = [slice(i, i + grp_sz) for i in range(0, MAC_LEN, grp_sz)]
+    change_case = methodcaller(case)
+
+    def formatter(nybbles):
+        """Return nybbles formatted according to the enclosing format."""
+        nybbles = change_case(nybbles)
+        return pref + sep.join([nybbles[grp] for grp in groups]) + suf
+
+    return formatter
+
+
+# one specialized formatter function per format name
+FORMATTERS = {name: make_formatter(fmt) for name, fmt in MAC_FORMAT.items()}
+
+
+def mac_nybbles(in_str):
+    """Return string of the 12 nybbles of MAC address in_str.
+
+    Raise ValueError if in_str is not a valid MAC address representation.
+
+    Examples:
+    >>> mac_nybbles(' 0123456789Ab ')
+    '0123456789Ab'
+    >>> mac_nybbles('1:23:45:67:89:Ab')
+    '0123456789Ab'
+    >>> mac_nybbles('1:23:45-67:89:Ab')
+    Traceback (most recent call last):
+        ...
+    ValueError: "1:23:45-67:89:Ab" is not a valid MAC address representation
+
+    """
+    nybbles = in_str.strip()
+    if is_valid_mac_string(nybbles):
+        return nybbles
+    nybbles = keep_hex(in_str)
+    if not is_mac(nybbles):
+        nybbles = keep_zero_padded_hex(in_str)
+    if nybbles is None or not is_mac(nybbles):
+        raise ValueError('"%s" is not a valid MAC address representation'
+                         % in_str)
+    return nybbles
 
 
 def format_mac(in_str, fmt):
@@ -220,6 +308,8 @@ def format_mac(in_str, fmt):
     Examples:
     >>> format_mac('01:23:45:67:89:Ab', 'linux')
     '01:23:45:67:89:ab'
+    >>> format_mac(' 0123456789Ab ', 'cisco')
+    '0123.4567.89ab'
     >>> format_mac('1:23:45:67:89:Ab', 'arista')
     '0123.4567.89ab'
     >>> format_mac(' 12345 6789Ab ', 'default')
@@ -268,21 +358,50 @@ def format_mac(in_str, fmt):
     KeyError: 47
 
     """
-    out_lst = []
-    pref, grp_sz, sep, case, suf = lookup_format(fmt)
-    nybbles = keep_hex(in_str)
-    if not is_mac(nybbles):
-        nybbles = keep_zero_padded_hex(in_str)
-    if nybbles is None or not is_mac(nybbles):
-        raise ValueError('"%s" is not a valid MAC address representation'
-                         % in_str)
-    for i, nyb in enumerate(nybbles):
-        if i > 0 and i % grp_sz == 0:
-            out_lst.append(sep)
-        out_lst.append(nyb)
-    out_str = ''.join(out_lst)
-    out_str = out_str.upper() if case == 'upper' else out_str.lower()
-    return pref + out_str + suf
+    formatter = FORMATTERS[fmt]
+    return formatter(mac_nybbles(in_str))
+
+
+def format_macs(in_strs, fmt):
+    """Print MAC addresses from in_strs formatted according to fmt.
+
+    The output format is looked up once for all MAC addresses. Invalid MAC
+    addresses are reported on standard error. Return 0 if all MAC addresses
+    are valid, 1 otherwise.
+
+    Examples:
+    >>> format_macs(['1:23:45:67:89:Ab', '0123456789ab'], 'cisco')
+    0123.4567.89ab
+    0123.4567.89ab
+    0
+    >>> format_macs([], 'cisco')
+    0
+
+    An undecodable input line (here as read with surrogateescape) is reported
+    as invalid, and the following lines are still processed:
+    >>> stderr, sys.stderr = sys.stderr, sys.stdout
+    >>> format_macs(['\\udcff1:23:45:67:89:ab', '01:23:45:67:89:ab'],
+    ...             'default')  # doctest: +ELLIPSIS
+    macfmt.py: ERROR: "...1:23:45:67:89:ab" is not a valid MAC address ...
+    01-23-45-67-89-AB
+    1
+    >>> sys.stderr = stderr
+    >>> format_macs(['01:23:45:67:89:Ab'], 'invalid format')
+    Traceback (most recent call last):
+        ...
+    KeyError: 'invalid format'
+
+    """
+    exit_code = 0
+    formatter = FORMATTERS[fmt]
+    write = sys.stdout.write
+    for in_str in in_strs:
+        try:
+            write(formatter(mac_nybbles(in_str)) + '\n')
+        except ValueError as exc:
+            exit_code = 1
+            print('%s: ERROR: %s' % (PROG, exc), file=sys.stderr)
+    return exit_code
 
 
 def output_formats_with_example_mac():
@@ -331,7 +450,9 @@ if __name__ == '__main__':
     # pylint3 version 1.8.3 from Ubuntu 18.04 gets confused here
     # pylint: disable=all
     import argparse
-    import sys
+    import errno
+    import io
+    import os
 
     cmd_line = argparse.ArgumentParser(
         prog=PROG, description=DESC, epilog=EPIL,
@@ -347,19 +468,39 @@ if __name__ == '__main__':
     cmd_line.add_argument('MAC', nargs='*', help='MAC addresses to format')
     args = cmd_line.parse_args()
 
-    exit_code = 0
     if args.list_formats:
         output_formats_with_example_mac()
-        sys.exit(exit_code)
-
-    mac_addresses = args.MAC if args.MAC else sys.stdin
-    for mac in mac_addresses:
-        try:
-            print(format_mac(mac, args.format))
-        except ValueError as exc:
-            exit_code = 1
-            print('%s: ERROR: %s' % (PROG, exc), file=sys.stderr)
-
+        sys.exit(0)
+
+    # Python 3 only: reopen the standard streams with larger buffers, but
+    # keep their encoding and error handler (e.g., surrogateescape), so that
+    # undecodable input lines are still reported per line
+    if args.MAC:
+        mac_addresses = args.MAC
+    elif hasattr(sys.stdin, 'buffer'):
+        mac_addresses = io.open(sys.stdin.fileno(), 'r', buffering=1 << 16,
+                                encoding=sys.stdin.encoding,
+                                errors=sys.stdin.errors, newline='\n',
+                                closefd=False)
+    else:
+        mac_addresses = sys.stdin
+    if hasattr(sys.stdout, 'buffer') and not sys.stdout.isatty():
+        # keep line buffering for interactive use, buffer heavily otherwise
+        sys.stdout = io.open(sys.stdout.fileno(), 'w', buffering=1 << 20,
+                             encoding=sys.stdout.encoding,
+                             errors=sys.stdout.errors, newline='\n',
+                             closefd=False)
+    try:
+        exit_code = format_macs(mac_addresses, args.format)
+        sys.stdout.flush()
+    except IOError as exc:
+        if exc.errno != errno.EPIPE:
+            raise
+        # reader went away (e.g., '| head'): discard any buffered output, so
+        # that flushing stdout at exit does not fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        print('%s: ERROR: %s' % (PROG, exc), file=sys.stderr)
+        exit_code = 1
     sys.exit(exit_code)
 
 # vim:tabstop=4:shiftwidth=4:expandtab:
@@ -19,14 +19,12 @@ Use 10 bytes for the Cisco SR-520, 1812W.
 The number of bytes might differ with ROMMON version on the same hardware.
 '''
 
+from struct import unpack
 from sys import argv
 
 cookie = ''.join(argv[1:])
-values, tmp = [], ''
-for char in cookie:
-    tmp += char
-    if len(tmp) % 4 == 0:
-        values.append(int(tmp, 16))
-        tmp = ''
-chksum = sum(values) & 0xFFFF
+# an incomplete 16 bit word at the end of the cookie is ignored
+cookie = cookie[:len(cookie) - len(cookie) % 4]
+raw = bytes.fromhex(cookie)
+chksum = sum(unpack('>%dH' % (len(raw) // 2), raw)) & 0xFFFF
 print('%04x' % (chksum))
@@ -25,36 +25,43 @@ from __future__ import (
 )
 __metaclass__ = type
 
-import fileinput
 import re
 import sys
 
+
+def input_lines(file_names):
+    """Yield lines of the given files, or of standard input for none or "-"."""
+    for name in file_names or ["-"]:
+        if name == "-":
+            for line in sys.stdin:
+                yield line
+        else:
+            with open(name, "r", buffering=1 << 16) as in_file:
+                for line in in_file:
+                    yield line
+
+
 if len(sys.argv) < 2:
     print("Usage: section.py PATTERN [FILE...]", file=sys.stderr)
     sys.exit(2)
 
 pattern = re.compile(sys.argv[1])
-indent = re.compile(r"[ \t]*")
-tab = re.compile(r"\t")
-eight_spc = " " * 8
 in_sec = False
-ind = ""
-line_ind = ""
-
-for line in fileinput.input(sys.argv[2:]):
-    line_ind = indent.match(line)
-    if line_ind:
-        line_ind = line_ind.group(0)
-        line_ind = tab.subn(eight_spc, line_ind)[0]
-    else:
-        line_ind = ""
-    if pattern.search(line) or (in_sec and len(line_ind) > len(ind)):
-        if (not in_sec) or (len(line_ind) < len(ind)):
+ind = 0
+line_ind = 0
+write = sys.stdout.write
+
+for line in input_lines(sys.argv[2:]):
+    # indentation width, counting a tab as eight spaces
+    line_ind = len(line) - len(line.lstrip(" \t"))
+    line_ind += 7 * line.count("\t", 0, line_ind)
+    if pattern.search(line) or (in_sec and line_ind > ind):
+        if (not in_sec) or (line_ind < ind):
             ind = line_ind
         in_sec = True
-        print(line, end='')
+        write(line)
     else:
         in_sec = False
-        ind = ""
+        ind = 0
 
 # vim:tabstop=4:shiftwidth=4:expandtab: